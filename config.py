@@ -12,3 +12,24 @@ OUTPUT_DIR = "output"
 
 # Request Configuration
 REQUEST_TIMEOUT = 30  # seconds
+
+# Static fetch: try plain HTTP before launching the browser, and fall back to
+# the browser when the page yields too little markdown (likely JS-rendered)
+STATIC_FETCH = True
+MIN_STATIC_MARKDOWN_LENGTH = 200  # characters
+
+# Pages already in OUTPUT_DIR/pages are reused on reruns; set to True to recrawl them
+FORCE_RECRAWL = False
+
+# Retry and adaptive concurrency: fetches that look transient (429, 5xx,
+# navigation timeouts, connection resets) are retried with exponential backoff,
+# and concurrency drops by one slot whenever more than FAILURE_THRESHOLD of the
+# last FAILURE_WINDOW requests failed that way, recovering after a full window
+# of successes
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0  # seconds
+FAILURE_WINDOW = 10
+FAILURE_THRESHOLD = 0.3
+
+# Generated sitemaps are cached in OUTPUT_DIR/sitemap_cache and reused for this long
+SITEMAP_CACHE_TTL = 24 * 60 * 60  # seconds
@@ -1,112 +1,292 @@
 import os
 import sys
+import time
+import random
+import shutil
 import asyncio
-import requests
+import hashlib
+import httpx
 import subprocess
-from xml.etree import ElementTree
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
 from tqdm.asyncio import tqdm
-from collections import Counter
+from lxml import etree
+from collections import Counter, deque
 from dataclasses import dataclass, field
 import re  # Add this import at the top
 
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl4ai.content_scraping_strategy import WebScrapingStrategy
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
 from config import (
     MAX_CONCURRENT_REQUESTS, 
     BROWSER_CONFIG, 
     REQUEST_TIMEOUT,
+    STATIC_FETCH,
+    FORCE_RECRAWL,
+    MAX_RETRIES,
+    RETRY_BACKOFF,
+    FAILURE_WINDOW,
+    FAILURE_THRESHOLD,
+    SITEMAP_CACHE_TTL,
+    MIN_STATIC_MARKDOWN_LENGTH,
     BASE_URL,
     OUTPUT_DIR
 )
 
+# One pooled HTTP client shared by sitemap lookups and static page fetches
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS),
+    timeout=REQUEST_TIMEOUT,
+    follow_redirects=True,
+)
+scraping_strategy = WebScrapingStrategy()
+markdown_generator = DefaultMarkdownGenerator()
+
 @dataclass
 class CrawlStats:
     total_urls: int = 0
     successful_urls: int = 0
     total_words: int = 0
+    cached_urls: int = 0
     failures: Counter = field(default_factory=Counter)  # Fix: use default_factory for mutable Counter
 
     @property
     def success_rate(self) -> float:
         return (self.successful_urls / self.total_urls * 100) if self.total_urls > 0 else 0
 
-def update_status_file(stats: CrawlStats, output_dir: str, log_entry: tuple = None):
-    """Update status file with statistics and optionally add a log entry."""
+class AdaptiveLimiter:
+    """Concurrency limit that shrinks on bursts of retryable failures and grows back on success."""
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.active = 0
+        self.outcomes = deque(maxlen=FAILURE_WINDOW)
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    async def record(self, ok: bool):
+        """Record one request outcome and adjust the limit."""
+        async with self.condition:
+            self.outcomes.append(ok)
+            failures = self.outcomes.count(False)
+            if not ok and failures > FAILURE_THRESHOLD * FAILURE_WINDOW and self.limit > 1:
+                # Server is struggling or rate limiting: back off one slot
+                self.limit -= 1
+                self.outcomes.clear()
+            elif failures == 0 and len(self.outcomes) == FAILURE_WINDOW and self.limit < self.max_limit:
+                # A full window of successes: give one slot back
+                self.limit += 1
+                self.outcomes.clear()
+                self.condition.notify()
+
+# Distinct failure types kept in CrawlStats; the rest are counted as "other"
+MAX_FAILURE_TYPES = 200
+
+# crawl4ai prefixes browser failures with where they were caught, e.g.
+# "Unexpected error in _crawl_web at line N in _crawl_web (/path/to/file.py):"
+# followed by "Error: <cause>"; the prefix alone would fill a whole bucket key
+CRAWL4AI_ERROR_PREFIX_RE = re.compile(r"^\s*Unexpected error in .*?\):\s*(?:Error:\s*)?")
+
+def bucket_error(message: Optional[str]) -> str:
+    """Reduce an error message to a stable failure type with URLs and numbers masked."""
+    text = CRAWL4AI_ERROR_PREFIX_RE.sub('', message or '')
+    # The cause itself can span several lines, so collapse whitespace before truncating
+    text = ' '.join(text.split()) or 'unknown'
+    text = re.sub(r'https?://\S+', '<URL>', text)
+    return re.sub(r'\d+', 'N', text)[:120]
+
+LOG_TABLE_HEADER = (
+    "| Timestamp | URL | Status | Filename |\n"
+    "|-----------|-----|--------|----------|\n"
+)
+
+# (epoch second, formatted string) of the last formatted timestamp
+_timestamp_cache = [0, ""]
+
+def now_str() -> str:
+    """Current local time for log rows, formatted at most once per second."""
+    now = int(time.time())
+    if now != _timestamp_cache[0]:
+        _timestamp_cache[0] = now
+        _timestamp_cache[1] = datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+    return _timestamp_cache[1]
+
+def url_to_filename(url: str) -> str:
+    """Derive the page filename (without extension) from the URL path."""
+    return urlparse(url).path.strip('/').replace('/', '_') or 'index'
+
+def dedupe_urls(urls: List[str]) -> List[str]:
+    """Drop URLs that normalize to an earlier entry or would overwrite its file."""
+    seen_keys = set()
+    seen_filenames = set()
+    unique_urls = []
+    for url in urls:
+        # Fragment, query and trailing-slash variants render the same page
+        key = urlparse(url)._replace(fragment='', query='').geturl().rstrip('/')
+        filename = url_to_filename(url)
+        if key in seen_keys or filename in seen_filenames:
+            continue
+        seen_keys.add(key)
+        seen_filenames.add(filename)
+        unique_urls.append(url)
+    return unique_urls
+
+def create_status_file(output_dir: str):
+    """Create or reset the status.md file with headers."""
+    status_file = os.path.join(output_dir, 'status.md')
+    with open(status_file, 'w', encoding='utf-8') as f:
+        f.write("# Crawling Status\n\n")
+        f.write(LOG_TABLE_HEADER)
+
+def append_log_row(log_queue: asyncio.Queue, row: tuple):
+    """Queue one (timestamp, url, status, filename) row for the status.md writer."""
+    timestamp, url, status, filename = row
+    log_queue.put_nowait(f"| {timestamp} | {url} | {status} | {filename} |\n")
+
+def render_summary(stats: CrawlStats, output_dir: str):
+    """Rewrite status.md once with statistics, failure types and the crawl log."""
     status_file = os.path.join(output_dir, 'status.md')
     
-    # Create file with headers if it doesn't exist
-    if not os.path.exists(status_file):
-        with open(status_file, 'w', encoding='utf-8') as f:
-            f.write("# Crawling Results\n\n")
-            f.write("## Overall Statistics\n\n")
-            f.write("## Failure Types\n\n")
-            f.write("## Detailed Crawl Log\n\n")
-            f.write("| Timestamp | URL | Status | Filename |\n")
-            f.write("|-----------|-----|--------|----------|\n")
-    
-    # Read existing content
+    # Read the log rows appended during the crawl
     with open(status_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+        log_rows = f.read().split(LOG_TABLE_HEADER, 1)[-1]
     
-    # Update statistics section
     stats_section = (
         "## Overall Statistics\n\n"
         f"- Success Rate: {stats.success_rate:.2f}%\n"
         f"- Total Pages: {stats.total_urls}\n"
         f"- Successful Crawls: {stats.successful_urls}\n"
+        f"- Reused From Previous Run: {stats.cached_urls}\n"
         f"- Total Words: {stats.total_words:,}\n\n"
     )
     
-    # Update failure types section
-    failure_section = "## Failure Types\n\n"
-    if stats.failures:
-        for error, count in stats.failures.items():
-            failure_section += f"- {error}: {count}\n"
-    failure_section += "\n"
-    
-    # Split content at section markers
-    parts = content.split("## ")
-    header = parts[0]
-    log_section = "## Detailed Crawl Log\n\n" + parts[-1].split("Detailed Crawl Log\n\n")[1]
+    # Most frequent failure types first
+    failure_parts = ["## Failure Types\n\n"]
+    failure_parts.extend(f"- {error}: {count}\n" for error, count in stats.failures.most_common())
+    failure_parts.append("\n")
+    failure_section = "".join(failure_parts)
     
-    # Add new log entry if provided
-    if log_entry:
-        timestamp, url, status, filename = log_entry
-        log_section += f"| {timestamp} | {url} | {status} | {filename} |\n"
+    log_section = "## Detailed Crawl Log\n\n" + LOG_TABLE_HEADER + log_rows
     
-    # Combine all sections
-    updated_content = (
-        header +
-        stats_section +
-        failure_section +
-        log_section
-    )
-    
-    # Write updated content
     with open(status_file, 'w', encoding='utf-8') as f:
-        f.write(updated_content)
+        f.write("# Crawling Results\n\n")
+        f.write(stats_section)
+        f.write(failure_section)
+        f.write(log_section)
 
-def create_status_file(output_dir: str):
-    """Create or reset the status.md file with headers."""
-    status_file = os.path.join(output_dir, 'status.md')
-    with open(status_file, 'w', encoding='utf-8') as f:
-        f.write("# Crawling Status\n\n")
-        f.write("| Timestamp | URL | Status | Filename |\n")
-        f.write("|-----------|-----|--------|----------|\n")
+def read_file(filepath: str) -> bytes:
+    """Read raw file content (run via asyncio.to_thread)."""
+    with open(filepath, 'rb') as f:
+        return f.read()
 
-def collect_markdown_files(pages_dir: str, output_dir: str):
-    """Combine all markdown files into a single collected.md file."""
-    collected_file = os.path.join(output_dir, 'collected.md')
-    with open(collected_file, 'w', encoding='utf-8') as outfile:
-        for filename in sorted(os.listdir(pages_dir)):
-            if filename.endswith('.md'):
-                filepath = os.path.join(pages_dir, filename)
-                with open(filepath, 'r', encoding='utf-8') as infile:
-                    outfile.write(f"\n\n## {filename[:-3]}\n\n")
-                    outfile.write(infile.read())
-                    outfile.write("\n\n---\n")
+def write_file(filepath: str, data: bytes):
+    """Write raw content to a file (run via asyncio.to_thread)."""
+    with open(filepath, 'wb') as f:
+        f.write(data)
+
+def html_to_markdown(url: str, html: str) -> Optional[str]:
+    """Convert fetched HTML to markdown with crawl4ai's scraper and generator."""
+    scraped = scraping_strategy.scrap(url, html)
+    # The scraper returns None for an empty body
+    if scraped is None:
+        return None
+    cleaned_html = scraped['cleaned_html']
+    return markdown_generator.generate_markdown(cleaned_html, base_url=url).raw_markdown
+
+# Browser failures worth retrying: navigation timeouts and dropped connections.
+# Anything else (DNS, TLS, scraping errors) fails the same way on every attempt.
+TRANSIENT_ERROR_RE = re.compile(
+    r"timeout|timed out|ERR_TIMED_OUT|ERR_CONNECTION_(?:RESET|CLOSED|ABORTED)"
+    r"|ERR_NETWORK_CHANGED|ECONNRESET",
+    re.IGNORECASE,
+)
+
+def is_overload_status(status_code: int) -> bool:
+    """Whether an HTTP status means the server is rate limiting or failing."""
+    return status_code == 429 or status_code >= 500
+
+async def fetch_static_markdown(url: str) -> Tuple[Optional[str], Optional[int]]:
+    """Fetch a page without the browser.
+
+    Returns (markdown, HTTP status); markdown is None when the page needs a
+    full render, and the status is None when the request itself failed.
+    """
+    try:
+        response = await http_client.get(url)
+    except httpx.HTTPError:
+        return None, None
+    if response.status_code != 200 or 'html' not in response.headers.get('content-type', ''):
+        return None, response.status_code
+    
+    try:
+        content = await asyncio.to_thread(html_to_markdown, str(response.url), response.text)
+    except Exception:
+        # Conversion problems are not fatal; the browser gets a go instead
+        return None, response.status_code
+    # Near-empty output usually means the page is rendered by JavaScript
+    if content is None or len(content.strip()) < MIN_STATIC_MARKDOWN_LENGTH:
+        return None, response.status_code
+    return content, response.status_code
+
+async def write_queued(queue: asyncio.Queue, fh):
+    """Single writer task: drain queued lines into an open file handle."""
+    while True:
+        line = await queue.get()
+        try:
+            fh.write(line)
+        finally:
+            queue.task_done()
+
+class OrderedWriter:
+    """Single writer that appends (index, pieces) items to a file in index order.
+
+    Items that finish early are held until every lower index has arrived.
+    Workers call wait_turn before starting a job so they never run more than
+    `window` indexes ahead of the next one to write, which caps the buffer at
+    `window` pages even when a low index is stuck retrying.
+    """
+
+    def __init__(self, fh, window: int):
+        self.fh = fh
+        self.window = window
+        self.pending = {}
+        self.next_index = 0
+        self.queue = asyncio.Queue()
+        self.condition = asyncio.Condition()
+
+    async def wait_turn(self, index: int):
+        """Block until `index` is within the window of the next index to write."""
+        async with self.condition:
+            await self.condition.wait_for(lambda: index < self.next_index + self.window)
+
+    async def run(self):
+        while True:
+            index, pieces = await self.queue.get()
+            try:
+                self.pending[index] = pieces
+                written = self.next_index
+                while self.next_index in self.pending:
+                    for piece in self.pending.pop(self.next_index):
+                        self.fh.write(piece)
+                    self.next_index += 1
+                if self.next_index != written:
+                    async with self.condition:
+                        self.condition.notify_all()
+            finally:
+                self.queue.task_done()
 
 async def crawl_parallel(urls: List[str], output_dir: str):
     """Crawl multiple URLs in parallel with a concurrency limit."""
@@ -114,106 +294,235 @@ async def crawl_parallel(urls: List[str], output_dir: str):
     os.makedirs(pages_dir, exist_ok=True)
     stats = CrawlStats(total_urls=len(urls))
     
+    # Pages written by an earlier run are reused unless a recrawl is forced
+    existing_pages = set()
+    if not FORCE_RECRAWL:
+        with os.scandir(pages_dir) as entries:
+            existing_pages = {
+                entry.name for entry in entries
+                if entry.name.endswith('.md') and entry.stat().st_size > 0
+            }
+    
     browser_config = BrowserConfig(
         headless=BROWSER_CONFIG["headless"],
         verbose=BROWSER_CONFIG["verbose"],
         extra_args=BROWSER_CONFIG["extra_args"],
     )
-    crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
 
     # Create the crawler instance
     crawler = AsyncWebCrawler(config=browser_config)
     await crawler.start()
 
+    # Write the log table header once; rows are appended as pages finish
+    create_status_file(output_dir)
+    status_file = os.path.join(output_dir, 'status.md')
+    log_fh = open(status_file, 'a', encoding='utf-8', buffering=1 << 16)
+    log_queue = asyncio.Queue()
+    log_writer = asyncio.create_task(write_queued(log_queue, log_fh))
+
+    # Pages are appended to collected.md in URL order as they finish, so they are never re-read
+    collected_file = os.path.join(output_dir, 'collected.md')
+    collected_fh = open(collected_file, 'wb', buffering=1 << 20)
+    collector = OrderedWriter(collected_fh, window=MAX_CONCURRENT_REQUESTS)
+    collect_writer = asyncio.create_task(collector.run())
+
     try:
-        # Create a semaphore to limit concurrency
-        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        limiter = AdaptiveLimiter(MAX_CONCURRENT_REQUESTS)
         
-        async def process_url(url: str):
-            async with semaphore:
-                result = await crawler.arun(
-                    url=url,
-                    config=crawl_config,
-                    session_id="session1"
-                )
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                path = urlparse(url).path
-                filename = path.strip('/').replace('/', '_') or 'index'
-                filepath = f"{pages_dir}/{filename}.md"
-                
-                if result.success:
-                    content = result.markdown_v2.raw_markdown
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    stats.successful_urls += 1
-                    stats.total_words += len(content.split())
-                    # Add success entry to log
-                    update_status_file(stats, output_dir, (timestamp, url, "Success", f"{filename}.md"))
-                    return True, url, filename
+        async def fetch_page(url: str, crawl_config: CrawlerRunConfig):
+            """Return (markdown, error message, whether the failure is worth retrying)."""
+            if STATIC_FETCH:
+                content, status_code = await fetch_static_markdown(url)
+                if content is not None:
+                    return content, None, False
+                if status_code is not None and is_overload_status(status_code):
+                    # Back off instead of rendering the same URL in the browser
+                    return None, f"HTTP {status_code}", True
+            
+            # Fall back to the browser for dynamic or unreachable pages
+            result = await crawler.arun(
+                url=url,
+                config=crawl_config
+            )
+            if result.success:
+                # crawl4ai reports any page with HTML as a success, error pages included
+                if result.status_code is not None and is_overload_status(result.status_code):
+                    return None, f"HTTP {result.status_code}", True
+                return result.markdown_v2.raw_markdown, None, False
+            # Failures carry no status code, so classify them by message
+            retryable = bool(TRANSIENT_ERROR_RE.search(result.error_message or ''))
+            return None, result.error_message, retryable
+        
+        async def process_url(index: int, url: str, filename: str, filepath: str, crawl_config: CrawlerRunConfig) -> None:
+            cached = f"{filename}.md" in existing_pages
+            if cached:
+                content = await asyncio.to_thread(read_file, filepath)
+            else:
+                for attempt in range(MAX_RETRIES + 1):
+                    if attempt:
+                        # Exponential backoff with full jitter
+                        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt) * random.random())
+                    async with limiter:
+                        content, error_message, retryable = await fetch_page(url, crawl_config)
+                    await limiter.record(not retryable)
+                    if not retryable:
+                        break
+            timestamp = now_str()
+            
+            if content is not None:
+                if cached:
+                    stats.cached_urls += 1
+                    data = content
+                    # Count on text so Unicode whitespace splits words as on a fresh crawl
+                    content = data.decode('utf-8')
                 else:
-                    stats.failures[result.error_message] += 1
-                    # Add failure entry to log
-                    update_status_file(stats, output_dir, (timestamp, url, f"Failed: {result.error_message}", "N/A"))
-                    return False, url, "N/A"
+                    # Encode once; the same bytes go to the page file and collected.md
+                    data = content.encode('utf-8')
+                    # Write off the event loop so other crawls keep progressing
+                    await asyncio.to_thread(write_file, filepath, data)
+                stats.successful_urls += 1
+                stats.total_words += len(content.split())
+                # Queue the section in pieces so the page is never copied into a larger string
+                collector.queue.put_nowait((index, (f"\n\n## {filename}\n\n".encode('utf-8'), data, b"\n\n---\n")))
+                # Add success entry to log
+                status = "Cached" if cached else "Success"
+                append_log_row(log_queue, (timestamp, url, status, f"{filename}.md"))
+            else:
+                failure_type = bucket_error(error_message)
+                if failure_type not in stats.failures and len(stats.failures) >= MAX_FAILURE_TYPES:
+                    failure_type = "other"
+                stats.failures[failure_type] += 1
+                # Release the slot so later pages are not held back in collected.md
+                collector.queue.put_nowait((index, ()))
+                # Add failure entry to log
+                append_log_row(log_queue, (timestamp, url, f"Failed: {error_message}", "N/A"))
 
-        # Show progress bar for crawling
-        results = await tqdm.gather(*[process_url(url) for url in urls],
-                                  desc="Crawling pages")
+        # A fixed pool of workers pulls URLs from the queue, bounding concurrency
+        # Output paths are resolved once here, keeping per-URL work minimal
+        url_queue = asyncio.Queue()
+        for index, url in enumerate(urls):
+            filename = url_to_filename(url)
+            url_queue.put_nowait((index, url, filename, os.path.join(pages_dir, f"{filename}.md")))
         
-        # Update status file with results
-        update_status_file(stats, output_dir)
+        async def worker(worker_id: int, pbar):
+            # Each worker keeps its own browser tab so renders run in parallel;
+            # crawl4ai reads the session id from the run config, not from arun kwargs
+            crawl_config = CrawlerRunConfig(
+                cache_mode=CacheMode.BYPASS,
+                session_id=f"session-{worker_id}",
+            )
+            while True:
+                try:
+                    job = url_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # Don't run ahead of a slow page further than collected.md can buffer
+                await collector.wait_turn(job[0])
+                await process_url(*job, crawl_config)
+                pbar.update(1)
+
+        # Show progress bar for crawling
+        with tqdm(total=len(urls), desc="Crawling pages") as pbar:
+            await asyncio.gather(*[worker(i, pbar) for i in range(MAX_CONCURRENT_REQUESTS)])
         
-        # Show progress bar for combining files
-        with tqdm(desc="Combining markdown files") as pbar:
-            collect_markdown_files(pages_dir, output_dir)
-            pbar.update(1)
+        # Flush pending writes, then render the status file with final results
+        await asyncio.gather(log_queue.join(), collector.queue.join())
+        log_fh.close()
+        collected_fh.close()
+        render_summary(stats, output_dir)
         
         print(f"\nFinal Results:")
         print(f"Success Rate: {stats.success_rate:.2f}%")
         print(f"Total Pages: {stats.total_urls}")
+        print(f"Reused Pages: {stats.cached_urls}")
         print(f"Total Words: {stats.total_words:,}")
         
     finally:
+        log_writer.cancel()
+        collect_writer.cancel()
+        log_fh.close()
+        collected_fh.close()
         await crawler.close()
 
-def get_sitemap_urls(sitemap_location: str) -> List[str]:
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+LOC_TAGS = ('loc', f'{SITEMAP_NS}loc')
+URL_TAGS = ('url', f'{SITEMAP_NS}url')
+# lxml only reports these tags, and never expands entities from the document
+SITEMAP_PARSER_OPTIONS = {'tag': LOC_TAGS + URL_TAGS, 'resolve_entities': False}
+
+def iter_locs(events) -> Iterator[str]:
+    """Yield <loc> URLs from parser end events, clearing finished elements."""
+    for _, elem in events:
+        if elem.tag in LOC_TAGS:
+            if elem.text:
+                yield elem.text
+            elem.clear()
+        elif elem.tag in URL_TAGS:
+            # Drop finished <url> entries so memory stays flat
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+def read_local_sitemap(sitemap_path: str) -> List[str]:
+    """Stream <loc> URLs from a sitemap file on disk."""
+    return list(iter_locs(etree.iterparse(sitemap_path, events=('end',), **SITEMAP_PARSER_OPTIONS)))
+
+async def get_sitemap_urls(sitemap_location: str) -> List[str]:
     """Get URLs from website sitemap."""
     try:
         # Handle remote sitemap URLs vs local files
-        if sitemap_location.startswith('http'):
-            response = requests.get(sitemap_location, timeout=REQUEST_TIMEOUT)
+        if not sitemap_location.startswith('http'):
+            return await asyncio.to_thread(read_local_sitemap, sitemap_location)
+
+        # Parse the body as it streams in instead of building a full DOM
+        urls = []
+        parser = etree.XMLPullParser(events=('end',), **SITEMAP_PARSER_OPTIONS)
+        async with http_client.stream('GET', sitemap_location) as response:
             response.raise_for_status()
-            content = response.text
-        else:
-            # Local file
-            with open(sitemap_location, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-        root = ElementTree.fromstring(content)
-        
-        # Try standard sitemap format first
-        urls = root.findall(".//url/loc")
-        if not urls:
-            # Try alternate namespace format
-            namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            urls = root.findall('.//ns:loc', namespace)
-        
-        return [url.text for url in urls if url.text]
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+                urls.extend(iter_locs(parser.read_events()))
+        parser.close()
+        return urls
     except Exception as e:
         print(f"Error reading sitemap: {e}")
         return []
 
-def check_sitemap_exists(base_url: str) -> bool:
+async def check_sitemap_exists(base_url: str) -> bool:
     """Check if sitemap.xml exists at the given URL."""
     sitemap_url = urljoin(base_url, 'sitemap.xml')
     try:
-        response = requests.head(sitemap_url, timeout=REQUEST_TIMEOUT)
+        response = await http_client.head(sitemap_url, follow_redirects=False)
         return response.status_code == 200
     except Exception:
         return False
 
+def sitemap_cache_path(base_url: str, generator: str) -> str:
+    """Location of the cached sitemap for a base URL and generator."""
+    key = hashlib.sha1(f"{generator}:{base_url}".encode('utf-8')).hexdigest()
+    return os.path.join(OUTPUT_DIR, 'sitemap_cache', f"{key}.xml")
+
+def get_cached_sitemap(base_url: str, generator: str) -> Optional[str]:
+    """Return a previously generated sitemap if it is younger than SITEMAP_CACHE_TTL."""
+    cache_path = sitemap_cache_path(base_url, generator)
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < SITEMAP_CACHE_TTL:
+        print(f"Using cached sitemap from {cache_path}")
+        return cache_path
+    return None
+
+def store_cached_sitemap(sitemap_path: str, base_url: str, generator: str) -> str:
+    """Copy a freshly generated sitemap into the cache and return the cached path."""
+    cache_path = sitemap_cache_path(base_url, generator)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    shutil.copyfile(sitemap_path, cache_path)
+    return cache_path
+
 def generate_sitemap(base_url: str) -> str:
     """Generate sitemap.xml using Node.js script."""
+    cached_path = get_cached_sitemap(base_url, 'simple')
+    if cached_path:
+        return cached_path
+    
     print("Generating sitemap.xml...")
     generator_dir = os.path.join(os.path.dirname(__file__), 'sitemap_generator', 'simple_generator')
     
@@ -227,11 +536,19 @@ def generate_sitemap(base_url: str) -> str:
             cwd=generator_dir  # Set working directory for the script
         )
         print(result.stdout)
-        return os.path.join(generator_dir, 'sitemap.xml')
+        return store_cached_sitemap(os.path.join(generator_dir, 'sitemap.xml'), base_url, 'simple')
     except subprocess.CalledProcessError as e:
         print(f"Error generating sitemap: {e.stderr}")
         raise
 
+# Patterns for rewriting the Node generator configs, compiled once at import
+GENERATOR_URL_RE = re.compile(r"const url = '.*';")
+SITEMAPPER_CONFIG_RE = re.compile(
+    r"(?P<base>base: '.*')"
+    r"|(?P<urls>urls: \[(?s:.*?)\])"
+    r"|(?P<strict>strictPresence: '.*')"
+)
+
 def update_sitemapper_config(url: str):
     """Update the config.js for sitemapper-for-js."""
     config_path = os.path.join(
@@ -242,37 +559,27 @@ def update_sitemapper_config(url: str):
     )
     
     domain = urlparse(url).netloc + urlparse(url).path.rstrip('/')
+    replacements = {
+        'base': f"base: '{url}'",
+        'urls': f"urls: ['{url}']",
+        'strict': f"strictPresence: '{domain}'",
+    }
     
     with open(config_path, 'r') as f:
         content = f.read()
     
-    # Update base URL
-    content = re.sub(
-        r"base: '.*'",
-        f"base: '{url}'",
-        content
-    )
-    
-    # Update urls array
-    content = re.sub(
-        r"urls: \[.*?\]",
-        f"urls: ['{url}']",
-        content,
-        flags=re.DOTALL
-    )
-    
-    # Update strictPresence
-    content = re.sub(
-        r"strictPresence: '.*'",
-        f"strictPresence: '{domain}'",
-        content
-    )
+    # Update base URL, urls array and strictPresence in one scan
+    content = SITEMAPPER_CONFIG_RE.sub(lambda m: replacements[m.lastgroup], content)
     
     with open(config_path, 'w') as f:
         f.write(content)
 
 def generate_sitemap_advanced(base_url: str) -> str:
     """Generate sitemap using sitemapper-for-js for dynamic websites."""
+    cached_path = get_cached_sitemap(base_url, 'advanced')
+    if cached_path:
+        return cached_path
+    
     print("Attempting advanced sitemap generation...")
     generator_dir = os.path.join(os.path.dirname(__file__), 'sitemap_generator', 'sitemapper-for-js')
     
@@ -280,58 +587,66 @@ def generate_sitemap_advanced(base_url: str) -> str:
         # Update config with current URL
         update_sitemapper_config(base_url)
         
-        # Run the advanced generator
+        # Run the advanced generator (what `npm start` runs, minus npm's startup)
         result = subprocess.run(
-            ['npm', 'start'],
+            ['node', 'server.js'],
             capture_output=True,
             text=True,
             check=True,
             cwd=generator_dir
         )
         print(result.stdout)
-        return os.path.join(generator_dir, 'sitemap.xml')
+        return store_cached_sitemap(os.path.join(generator_dir, 'sitemap.xml'), base_url, 'advanced')
     except subprocess.CalledProcessError as e:
         print(f"Error generating sitemap with advanced generator: {e.stderr}")
         raise
 
 async def main():
-    print(f"Processing website: {BASE_URL}")
-    print(f"Output directory: {OUTPUT_DIR}")
+    try:
+        print(f"Processing website: {BASE_URL}")
+        print(f"Output directory: {OUTPUT_DIR}")
     
-    # Try existing sitemap first
-    if check_sitemap_exists(BASE_URL):
-        sitemap_url = urljoin(BASE_URL, 'sitemap.xml')
-        print(f"Found existing sitemap at: {sitemap_url}")
-        try:
-            urls = get_sitemap_urls(sitemap_url)
-            print(f"Successfully parsed remote sitemap")
-        except Exception as e:
-            print(f"Error with remote sitemap: {e}")
-            urls = []
-    else:
-        # Try simple generator first
-        print("No sitemap.xml found. Trying simple generator...")
-        update_generator_url(BASE_URL)
-        sitemap_path = generate_sitemap(BASE_URL)
-        print(f"Generated sitemap at: {sitemap_path}")
-        urls = get_sitemap_urls(sitemap_path)
+        # Try existing sitemap first
+        if await check_sitemap_exists(BASE_URL):
+            sitemap_url = urljoin(BASE_URL, 'sitemap.xml')
+            print(f"Found existing sitemap at: {sitemap_url}")
+            try:
+                urls = await get_sitemap_urls(sitemap_url)
+                print(f"Successfully parsed remote sitemap")
+            except Exception as e:
+                print(f"Error with remote sitemap: {e}")
+                urls = []
+        else:
+            # Try simple generator first
+            print("No sitemap.xml found. Trying simple generator...")
+            update_generator_url(BASE_URL)
+            sitemap_path = generate_sitemap(BASE_URL)
+            print(f"Generated sitemap at: {sitemap_path}")
+            urls = await get_sitemap_urls(sitemap_path)
         
-        # If simple generator didn't find enough URLs, try advanced generator
-        if len(urls) <= 2:
-            print("Simple generator failed to find enough URLs. Trying advanced generator...")
-            sitemap_path = generate_sitemap_advanced(BASE_URL)
-            print(f"Generated advanced sitemap at: {sitemap_path}")
-            urls = get_sitemap_urls(sitemap_path)
+            # If simple generator didn't find enough URLs, try advanced generator
+            if len(urls) <= 2:
+                print("Simple generator failed to find enough URLs. Trying advanced generator...")
+                sitemap_path = generate_sitemap_advanced(BASE_URL)
+                print(f"Generated advanced sitemap at: {sitemap_path}")
+                urls = await get_sitemap_urls(sitemap_path)
     
-    # Create output directory if it doesn't exist
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+        # Create output directory if it doesn't exist
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    if not urls:
-        print("No URLs found to crawl")
-        return
+        if not urls:
+            print("No URLs found to crawl")
+            return
     
-    print(f"Found {len(urls)} URLs to crawl")
-    await crawl_parallel(urls, OUTPUT_DIR)
+        unique_urls = dedupe_urls(urls)
+        if len(unique_urls) < len(urls):
+            print(f"Collapsed {len(urls) - len(unique_urls)} duplicate URLs")
+        urls = unique_urls
+        
+        print(f"Found {len(urls)} URLs to crawl")
+        await crawl_parallel(urls, OUTPUT_DIR)
+    finally:
+        await http_client.aclose()
 
 def update_generator_url(url: str):
     """Update the URL in generate-sitemap.js."""
@@ -345,11 +660,7 @@ def update_generator_url(url: str):
         content = f.read()
     
     # Replace the URL in the JavaScript file using Python's re
-    updated_content = re.sub(
-        r"const url = '.*';",
-        f"const url = '{url}';",
-        content
-    )
+    updated_content = GENERATOR_URL_RE.sub(lambda m: f"const url = '{url}';", content)
     
     with open(generator_path, 'w') as f:
         f.write(updated_content)